@@ -2,11 +2,9 @@
 Streamlit UI for AI Resume Optimizer.
 """
 import streamlit as st
-import json
 from dotenv import load_dotenv
 from utils import extract_pdf_text, parse_resume_to_schema
 from tasks import run_resume_optimization_crew
-from pdf_generator import generate_resume_pdf
 
 load_dotenv()
 
@@ -37,6 +35,16 @@ job_description = st.text_area(
     placeholder="Paste the job description including requirements, responsibilities, and qualifications..."
 )
 
+# Run options
+fast_mode = st.checkbox(
+    "Fast mode",
+    help="Analyze the job description and rewrite the resume in a single AI call. Faster, but skips the separate Strategist pass."
+)
+regenerate = st.checkbox(
+    "Regenerate",
+    help="Ignore any saved result for this resume and job description and run the AI agents again."
+)
+
 # Optimize button
 if uploaded_file is not None and job_description:
     if st.button("Optimize with CrewAI", type="primary"):
@@ -58,10 +66,15 @@ if uploaded_file is not None and job_description:
         with st.spinner("Running AI agents to optimize your resume..."):
             try:
                 # Run CrewAI optimization
-                result = run_resume_optimization_crew(resume_text, job_description)
+                result = run_resume_optimization_crew(
+                    resume_text,
+                    job_description,
+                    fast=fast_mode,
+                    use_cache=not regenerate
+                )
                 
-                # Display Strategist's analysis in expander
-                with st.expander("📊 Strategist's Analysis", expanded=True):
+                # Display job description analysis in expander
+                with st.expander("📊 Job Description Analysis" if fast_mode else "📊 Strategist's Analysis", expanded=True):
                     analysis = result.get('analysis', {})
                     
                     if isinstance(analysis, dict):
@@ -125,6 +138,8 @@ if uploaded_file is not None and job_description:
                         
                         # Generate PDF
                         try:
+                            # Deferred so fpdf is only loaded once a PDF is requested
+                            from pdf_generator import generate_resume_pdf
                             pdf_bytes = generate_resume_pdf(resume_schema)
                             
                             # Download button
@@ -164,5 +179,7 @@ with st.sidebar:
     4. **Resume Rewriting**: The Writer agent optimizes your resume
     5. **Download**: Get your optimized resume as a PDF
     
+    **Fast mode** runs both steps as a single AI call for quicker results.
+    
     **Note**: Make sure you have set your `OPENAI_API_KEY` in the `.env` file.
     """)
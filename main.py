@@ -1,9 +1,8 @@
 import streamlit as st
-import PyPDF2
-import io
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
+from utils import extract_pdf_text
 
 load_dotenv()
 
@@ -13,17 +12,6 @@ st.title("AI Resume Critic")
 
 st.markdown("""Upload your resume and let the AI analyze it for you!""")
 
-def extract_text(file):
-    if file.type == "application/pdf":
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
-    elif file.type == "text/plain":
-        return str(file.read(), "utf-8")
-    return ""
-
 def get_ai_response(prompt):
     client = OpenAI(
         base_url="https://openrouter.ai/api/v1",
@@ -48,7 +36,7 @@ if uploaded_file is not None:
     if st.button("Analyze Resume"):
         with st.spinner("Analyzing..."):
             try:
-                resume_text = extract_text(uploaded_file)
+                resume_text = extract_pdf_text(uploaded_file)
                 prompt = f"""
                 You are an expert resume critic. 
                 The candidate is applying for the role of: {job_role if job_role else "General Role"}
@@ -1,24 +1,143 @@
 """
 CrewAI task definitions and crew orchestration.
 """
+import hashlib
 import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
 from crewai import Task, Crew, Process
-from agents import create_strategist_agent, create_writer_agent
+from agents import create_strategist_agent, create_writer_agent, llm
+from models import ResumeSchema
+from utils import find_json_object, load_json
 
 
-def create_analysis_task(job_description: str, strategist_agent) -> Task:
+# Crew results older than this are recomputed and deleted
+CREW_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Part of every cache key; bump when the prompts or the result shape change
+CREW_CACHE_VERSION = "1"
+
+
+def _crew_cache_path(resume_text: str, job_description: str, fast: bool) -> Optional[Path]:
     """
-    Creates the task for analyzing the job description.
+    Build the cache file path for a resume/job description pair and mode.
+    
+    The key also covers CREW_CACHE_VERSION and the configured model, so
+    prompt or model changes don't serve results produced by the old ones.
+    
+    Caching is opt-in: returns None unless RESUME_CRITIC_CACHE_DIR is set,
+    since entries hold the candidate's personal details in plaintext.
+    """
+    cache_root = os.getenv("RESUME_CRITIC_CACHE_DIR")
+    if not cache_root:
+        return None
+    mode = "fast" if fast else "full"
+    model = getattr(llm, "model_name", "")
+    key = hashlib.blake2b(
+        "\x00".join((CREW_CACHE_VERSION, model, mode, resume_text, job_description)).encode("utf-8"),
+        digest_size=16
+    ).hexdigest()
+    return Path(cache_root) / "crew" / f"{key}.json"
+
+
+def _load_cached_result(path: Path) -> Optional[dict]:
+    """Return a cached crew result, or None if missing, stale or unreadable."""
+    try:
+        if time.time() - path.stat().st_mtime > CREW_CACHE_TTL_SECONDS:
+            path.unlink(missing_ok=True)
+            return None
+        return load_json(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _prune_cache(directory: Path) -> None:
+    """Delete cache entries older than the TTL; failures are ignored."""
+    cutoff = time.time() - CREW_CACHE_TTL_SECONDS
+    try:
+        for entry in directory.glob("*.json"):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    entry.unlink(missing_ok=True)
+            except OSError:
+                pass
+    except OSError:
+        pass
+
+
+def _is_cacheable(result: dict) -> bool:
+    """Only results whose rewritten resume is valid ResumeSchema JSON are cached."""
+    try:
+        json_text = find_json_object(result.get('rewritten_resume') or '')
+        if not json_text:
+            return False
+        ResumeSchema.model_validate(load_json(json_text))
+        return True
+    except ValueError:
+        return False
+
+
+def _store_cached_result(path: Path, result: dict) -> None:
+    """Atomically write a crew result to the cache; failures are ignored."""
+    try:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+# JSON structures the agents are asked to return
+_ANALYSIS_JSON_FORMAT = """{
+    "keywords": ["keyword1", "keyword2", "keyword3", "keyword4", "keyword5"],
+    "tone": "description of the tone and style (e.g., 'achievement-driven, technical, results-oriented')",
+    "industry": "primary industry focus",
+    "key_phrases": ["phrase1", "phrase2", "phrase3"]
+}"""
+
+_RESUME_JSON_FORMAT = """{
+    "personal_info": {
+        "name": "...",
+        "email": "...",
+        "phone": "...",
+        "location": "..."
+    },
+    "summary": "4-6 sentence achievement-driven professional summary",
+    "work_experience": [
+        {
+            "title": "...",
+            "company": "...",
+            "rewritten_bullets": [
+                "T-A-R formatted bullet with quantifiable results",
+                "Another T-A-R bullet starting with strong action verb",
+                "..."
+            ]
+        }
+    ],
+    "skills": ["skill1", "skill2", "skill3", ...]
+}"""
+
+
+def _analysis_prompt(job_description: str, output_format: bool = True) -> str:
+    """
+    Build the Strategist's job description analysis instructions.
     
     Args:
         job_description: The job description text
-        strategist_agent: The Strategist agent instance
-        
-    Returns:
-        Task: Configured analysis task
+        output_format: Whether to build the standalone prompt, with the
+            Strategist persona and the JSON output spec
     """
-    return Task(
-        description=f"""You are a professional resume writer and ATS expert specializing in tech industry roles. Analyze the following job description to extract critical optimization insights.
+    persona = "You are a professional resume writer and ATS expert specializing in tech industry roles. " if output_format else ""
+    prompt = f"""{persona}Analyze the following job description to extract critical optimization insights.
 
 Job Description:
 {job_description}
@@ -33,36 +152,30 @@ Focus on:
 - Skills and tools that appear multiple times
 - Industry-specific terminology
 - Action verbs and achievement language
-- Quantifiable metrics mentioned in the job description
+- Quantifiable metrics mentioned in the job description"""
+    if output_format:
+        prompt += f"""
 
 Output your analysis as a JSON object with the following structure:
-{{
-    "keywords": ["keyword1", "keyword2", "keyword3", "keyword4", "keyword5"],
-    "tone": "description of the tone and style (e.g., 'achievement-driven, technical, results-oriented')",
-    "industry": "primary industry focus",
-    "key_phrases": ["phrase1", "phrase2", "phrase3"]
-}}""",
-        agent=strategist_agent,
-        expected_output="JSON object with keywords array, tone string, industry, and key phrases"
-    )
+{_ANALYSIS_JSON_FORMAT}"""
+    return prompt
 
 
-def create_rewrite_task(resume_text: str, analysis_result: str, writer_agent) -> Task:
+def _rewrite_prompt(resume_text: str, analysis_result: str, output_format: bool = True) -> str:
     """
-    Creates the task for rewriting the resume.
+    Build the Writer's resume rewrite instructions.
     
     Args:
         resume_text: Original resume text
-        analysis_result: Output from the Strategist agent
-        writer_agent: The Writer agent instance
-        
-    Returns:
-        Task: Configured rewrite task
+        analysis_result: Strategist's analysis, or a pointer to where it is
+        output_format: Whether to build the standalone prompt, with the
+            Writer persona, Strategist wording and the JSON output spec
     """
-    return Task(
-        description=f"""You are a world-class resume and LinkedIn profile writer with expertise in tech industry roles. Your task is to rewrite the resume to be highly impactful, achievement-driven, and keyword-optimized while maintaining authenticity.
+    persona = "You are a world-class resume and LinkedIn profile writer with expertise in tech industry roles. " if output_format else ""
+    source = "the Strategist's analysis" if output_format else "your job description analysis"
+    prompt = f"""{persona}Your task is to rewrite the resume to be highly impactful, achievement-driven, and keyword-optimized while maintaining authenticity.
 
-Strategist's Analysis:
+{"Strategist's Analysis" if output_format else "Job Description Analysis"}:
 {analysis_result}
 
 Original Resume Text:
@@ -73,7 +186,7 @@ CRITICAL INSTRUCTIONS:
 1. **Professional Summary (4-6 sentences)**:
    - Start with a powerful opening sentence
    - Highlight unique strengths and measurable achievements
-   - Use recruiter-friendly keywords from the Strategist's analysis
+   - Use recruiter-friendly keywords from {source}
    - Show industry versatility while maintaining clear specialization
    - Feel authentic and human (avoid generic filler)
    - Subtly connect past experience to future goals
@@ -88,7 +201,7 @@ CRITICAL INSTRUCTIONS:
    - Maintain accuracy - DO NOT fabricate experience or metrics
 
 3. **Skills Section**:
-   - Enhance with relevant keywords from the Strategist's analysis
+   - Enhance with relevant keywords from {source}
    - Prioritize skills that match the job description
    - Include both core technical skills and transferable skills
    - Make it modern and tailored to 2025 industry standards
@@ -98,48 +211,112 @@ CRITICAL INSTRUCTIONS:
    - Only enhance and optimize existing experience, don't create new roles
    - Ensure all achievements are believable and verifiable
 
-Format your output as JSON with this structure:
-{{
-    "personal_info": {{
-        "name": "...",
-        "email": "...",
-        "phone": "...",
-        "location": "..."
-    }},
-    "summary": "4-6 sentence achievement-driven professional summary",
-    "work_experience": [
-        {{
-            "title": "...",
-            "company": "...",
-            "rewritten_bullets": [
-                "T-A-R formatted bullet with quantifiable results",
-                "Another T-A-R bullet starting with strong action verb",
-                "..."
-            ]
-        }}
-    ],
-    "skills": ["skill1", "skill2", "skill3", ...]
-}}
+"""
+    if output_format:
+        prompt += f"""Format your output as JSON with this structure:
+{_RESUME_JSON_FORMAT}
+
+"""
+    prompt += """Remember: The goal is to create a tailored resume that speaks to the specific industry and role while emphasizing skills and measurable results."""
+    return prompt
 
-Remember: The goal is to create a tailored resume that speaks to the specific industry and role while emphasizing skills and measurable results.""",
+
+def create_analysis_task(job_description: str, strategist_agent) -> Task:
+    """
+    Creates the task for analyzing the job description.
+    
+    Args:
+        job_description: The job description text
+        strategist_agent: The Strategist agent instance
+        
+    Returns:
+        Task: Configured analysis task
+    """
+    return Task(
+        description=_analysis_prompt(job_description),
+        agent=strategist_agent,
+        expected_output="JSON object with keywords array, tone string, industry, and key phrases"
+    )
+
+
+def create_rewrite_task(resume_text: str, analysis_result: str, writer_agent) -> Task:
+    """
+    Creates the task for rewriting the resume.
+    
+    Args:
+        resume_text: Original resume text
+        analysis_result: Output from the Strategist agent
+        writer_agent: The Writer agent instance
+        
+    Returns:
+        Task: Configured rewrite task
+    """
+    return Task(
+        description=_rewrite_prompt(resume_text, analysis_result),
         agent=writer_agent,
         expected_output="JSON object matching the ResumeSchema structure with optimized, achievement-driven content"
     )
 
 
-def run_resume_optimization_crew(resume_text: str, job_description: str) -> dict:
+def create_combined_task(resume_text: str, job_description: str, writer_agent) -> Task:
     """
-    Orchestrates the CrewAI crew to optimize a resume.
+    Creates a single task that analyzes the job description and rewrites
+    the resume in one LLM call.
     
     Args:
-        resume_text: Original resume text extracted from PDF
-        job_description: Job description text
+        resume_text: Original resume text
+        job_description: The job description text
+        writer_agent: The Writer agent instance
         
     Returns:
-        dict: Dictionary containing:
-            - 'analysis': Strategist's analysis (keywords and tone)
-            - 'rewritten_resume': Writer's rewritten resume text
+        Task: Configured combined task
     """
+    return Task(
+        description=f"""You are a world-class resume writer and ATS expert specializing in tech industry roles. Complete the two steps below in order. Do not output anything between the steps; produce a single response at the end.
+
+=== STEP 1: JOB DESCRIPTION ANALYSIS ===
+
+{_analysis_prompt(job_description, output_format=False)}
+
+=== STEP 2: RESUME REWRITE ===
+
+{_rewrite_prompt(resume_text, "Use your analysis from Step 1", output_format=False)}
+
+=== OUTPUT FORMAT ===
+
+Return exactly ONE JSON object and nothing else, with two keys: "analysis" holding your Step 1 result and "resume" holding your Step 2 result. Do not return the two results as separate objects.
+
+"analysis" must have this structure:
+{_ANALYSIS_JSON_FORMAT}
+
+"resume" must have this structure:
+{_RESUME_JSON_FORMAT}""",
+        agent=writer_agent,
+        expected_output="JSON object with an 'analysis' object (keywords, tone, industry, key phrases) and a 'resume' object matching the ResumeSchema structure"
+    )
+
+
+def _parse_analysis(analysis_output: str) -> dict:
+    """Parse the Strategist's output, falling back to the raw text as tone."""
+    # Try to parse analysis as JSON
+    try:
+        # Look for JSON in the analysis output
+        analysis_json_match = None
+        if isinstance(analysis_output, str):
+            json_text = find_json_object(analysis_output)
+            if json_text:
+                analysis_json_match = load_json(json_text)
+    except Exception:
+        pass
+    
+    return analysis_json_match if analysis_json_match else {
+        "keywords": [],
+        "tone": analysis_output
+    }
+
+
+def _run_sequential_crew(resume_text: str, job_description: str) -> dict:
+    """Run the Strategist and Writer as two sequential tasks."""
     # Create agents
     strategist = create_strategist_agent()
     writer = create_writer_agent()
@@ -167,24 +344,100 @@ def run_resume_optimization_crew(resume_text: str, job_description: str) -> dict
     analysis_output = analysis_task.output.raw if hasattr(analysis_task.output, 'raw') else str(analysis_task.output)
     rewrite_output = rewrite_task.output.raw if hasattr(rewrite_task.output, 'raw') else str(rewrite_task.output)
     
-    # Try to parse analysis as JSON
-    try:
-        # Look for JSON in the analysis output
-        analysis_json_match = None
-        if isinstance(analysis_output, str):
-            import re
-            json_match = re.search(r'\{.*\}', analysis_output, re.DOTALL)
-            if json_match:
-                analysis_json_match = json.loads(json_match.group())
-    except Exception:
-        pass
-    
-    analysis_result = analysis_json_match if analysis_json_match else {
-        "keywords": [],
-        "tone": analysis_output
+    return {
+        'analysis': _parse_analysis(analysis_output),
+        'rewritten_resume': rewrite_output
     }
+
+
+def _run_combined_crew(resume_text: str, job_description: str) -> dict:
+    """Run analysis and rewrite as a single Writer task."""
+    writer = create_writer_agent()
+    combined_task = create_combined_task(resume_text, job_description, writer)
+    
+    crew = Crew(
+        agents=[writer],
+        tasks=[combined_task],
+        process=Process.sequential,
+        verbose=True
+    )
+    crew.kickoff()
+    
+    output = combined_task.output.raw if hasattr(combined_task.output, 'raw') else str(combined_task.output)
+    
+    # Split the combined object back into the two-task result shape. Models
+    # occasionally still emit the analysis and resume as two separate
+    # objects, so look at up to two consecutive objects.
+    parsed = []
+    remaining = output
+    while len(parsed) < 2:
+        json_text = find_json_object(remaining)
+        if not json_text:
+            break
+        try:
+            parsed.append(load_json(json_text))
+        except ValueError:
+            break
+        remaining = remaining[remaining.index(json_text) + len(json_text):]
+    
+    if parsed and isinstance(parsed[0], dict) and isinstance(parsed[0].get('resume'), dict):
+        analysis, resume = parsed[0].get('analysis'), parsed[0]['resume']
+    elif len(parsed) == 2 and all(isinstance(obj, dict) for obj in parsed):
+        analysis, resume = parsed
+    else:
+        analysis, resume = None, None
+    
+    if resume is not None:
+        return {
+            'analysis': analysis if isinstance(analysis, dict) else {"keywords": [], "tone": "Not specified"},
+            'rewritten_resume': json.dumps(resume)
+        }
     
+    # Unexpected shape: hand the raw output to the resume parser's fallbacks
     return {
-        'analysis': analysis_result,
-        'rewritten_resume': rewrite_output
+        'analysis': {"keywords": [], "tone": "Not specified"},
+        'rewritten_resume': output
     }
+
+
+def run_resume_optimization_crew(
+    resume_text: str,
+    job_description: str,
+    fast: bool = False,
+    use_cache: bool = True
+) -> dict:
+    """
+    Orchestrates the CrewAI crew to optimize a resume.
+    
+    When RESUME_CRITIC_CACHE_DIR is set, successful results are cached on
+    disk by the content of both inputs, so repeating the same resume and job
+    description skips the LLM calls.
+    
+    Args:
+        resume_text: Original resume text extracted from PDF
+        job_description: Job description text
+        fast: If True, analyze and rewrite in a single LLM call instead of
+            running the Strategist and Writer sequentially
+        use_cache: If False, ignore any cached result and run the crew again;
+            a successful new result replaces the cached one
+        
+    Returns:
+        dict: Dictionary containing:
+            - 'analysis': Strategist's analysis (keywords and tone)
+            - 'rewritten_resume': Writer's rewritten resume text
+    """
+    cache_path = _crew_cache_path(resume_text, job_description, fast)
+    if use_cache and cache_path is not None:
+        cached = _load_cached_result(cache_path)
+        if cached is not None:
+            return cached
+    
+    if fast:
+        output = _run_combined_crew(resume_text, job_description)
+    else:
+        output = _run_sequential_crew(resume_text, job_description)
+    
+    if cache_path is not None and _is_cacheable(output):
+        _store_cached_result(cache_path, output)
+        _prune_cache(cache_path.parent)
+    return output
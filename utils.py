@@ -1,34 +1,154 @@
 """
 Utility functions for PDF extraction and resume parsing.
 """
-import PyPDF2
+import hashlib
+import io
 import json
 import re
+import threading
+from collections import OrderedDict
 from typing import Optional
+import pypdfium2 as pdfium
 from models import ResumeSchema, Job
 
+try:
+    import orjson
+except ImportError:  # Usually present via crewai; stdlib json is used otherwise
+    orjson = None
+
+
+# PDFium is not thread-safe, even across documents, and Streamlit runs
+# sessions in parallel threads
+_PDFIUM_LOCK = threading.Lock()
+
+# Extracted upload text keyed by (BLAKE2b digest of the bytes, MIME type), so
+# the cache holds only text, never the uploaded files themselves
+_TEXT_CACHE: OrderedDict = OrderedDict()
+_TEXT_CACHE_SIZE = 32
+_TEXT_CACHE_LOCK = threading.Lock()
+
+# Separator between the text of consecutive PDF pages, for both backends
+_PAGE_SEPARATOR = "\n"
+
+
+# Patterns for parse_resume_to_schema, compiled once at import
+_NAME_RE = re.compile(r'(?:Name|Full Name):\s*(.+)', re.IGNORECASE)
+_EMAIL_RE = re.compile(r'Email:\s*([^\s]+)', re.IGNORECASE)
+_PHONE_RE = re.compile(r'Phone:\s*([^\n]+)', re.IGNORECASE)
+_SUMMARY_RE = re.compile(r'(?:Summary|Professional Summary):\s*(.+?)(?=\n\n|\n[A-Z])', re.DOTALL | re.IGNORECASE)
+_WORK_RE = re.compile(r'(?:Work Experience|Experience|Employment):\s*(.+?)(?=\n(?:Skills|Education|$))', re.DOTALL | re.IGNORECASE)
+_JOB_RE = re.compile(r'(?:Title|Position):\s*(.+?)\n(?:Company|Employer):\s*(.+?)\n(?:Bullets|Responsibilities):\s*(.+?)(?=\n(?:Title|Position|$))', re.DOTALL | re.IGNORECASE)
+_SKILLS_RE = re.compile(r'(?:Skills|Technical Skills):\s*(.+?)(?=\n\n|$)', re.DOTALL | re.IGNORECASE)
+_SKILL_SPLIT_RE = re.compile(r'[,;•\-\n]')
+
+# find_json_object uses the decoder's C scanner to locate objects
+_JSON_DECODER = json.JSONDecoder()
+
 
 def extract_pdf_text(file) -> str:
     """
     Extract text from uploaded PDF file.
     
+    Identical uploads (same bytes and type) are served from an in-process
+    cache, so re-running the optimizer on the same resume skips PDF parsing.
+    
     Args:
         file: Uploaded file object (Streamlit UploadedFile)
         
     Returns:
         str: Extracted text from PDF
     """
-    if file.type == "application/pdf":
-        pdf_reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
-    elif file.type == "text/plain":
-        return str(file.read(), "utf-8")
+    data = file.getvalue() if hasattr(file, "getvalue") else file.read()
+    key = (hashlib.blake2b(data, digest_size=16).digest(), file.type)
+    with _TEXT_CACHE_LOCK:
+        text = _TEXT_CACHE.get(key)
+        if text is not None:
+            _TEXT_CACHE.move_to_end(key)
+            return text
+    
+    text = _extract_text_from_bytes(data, file.type)
+    with _TEXT_CACHE_LOCK:
+        _TEXT_CACHE[key] = text
+        _TEXT_CACHE.move_to_end(key)
+        while len(_TEXT_CACHE) > _TEXT_CACHE_SIZE:
+            _TEXT_CACHE.popitem(last=False)
+    return text
+
+
+def _extract_text_from_bytes(data: bytes, file_type: str) -> str:
+    """Extract text from raw file bytes."""
+    if file_type == "application/pdf":
+        try:
+            return _extract_pdf_text_pdfium(data)
+        except pdfium.PdfiumError:
+            pass  # Fall back to PyPDF2 for PDFs PDFium cannot open
+        import PyPDF2  # Deferred: only needed on the PyPDF2 path
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+        return _PAGE_SEPARATOR.join(page.extract_text() or "" for page in pdf_reader.pages)
+    elif file_type == "text/plain":
+        return str(data, "utf-8")
     return ""
 
 
+def _extract_pdf_text_pdfium(data: bytes) -> str:
+    """Extract PDF text with PDFium's native text layer."""
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            # PDFium ends lines with \r\n; match PyPDF2's \n so both backends
+            # feed identical text (and crew cache keys) downstream
+            return _PAGE_SEPARATOR.join(
+                page.get_textpage().get_text_range().replace("\r\n", "\n") for page in pdf
+            )
+        finally:
+            pdf.close()
+
+
+def find_json_object(text: str) -> Optional[str]:
+    """
+    Find the first JSON object embedded in free-form text.
+    
+    Tries each '{' in turn with the stdlib decoder's C scanner, so the text
+    is never walked character by character in Python.
+    
+    Args:
+        text: Agent output that may wrap JSON in prose or code fences
+        
+    Returns:
+        Optional[str]: The object's source text, or None if the text holds
+        no valid JSON object
+    """
+    start = text.find('{')
+    while start >= 0:
+        try:
+            _, end = _JSON_DECODER.raw_decode(text, start)
+            return text[start:end]
+        except ValueError:
+            start = text.find('{', start + 1)
+    return None
+
+
+def load_json(text: str):
+    """
+    Parse a JSON document, using orjson when it is installed.
+    
+    Args:
+        text: JSON text, typically extracted from an agent's output
+        
+    Returns:
+        The decoded JSON value
+        
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # Retry with json, which also accepts NaN/Infinity literals
+    return json.loads(text)
+
+
 def parse_resume_to_schema(text: str) -> ResumeSchema:
     """
     Parse rewritten resume text into ResumeSchema.
@@ -48,9 +168,9 @@ def parse_resume_to_schema(text: str) -> ResumeSchema:
     # Try to parse as JSON first (if agent outputs JSON)
     try:
         # Look for JSON in the text
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            data = json.loads(json_match.group())
+        json_text = find_json_object(text)
+        if json_text:
+            data = load_json(json_text)
             return ResumeSchema.model_validate(data)
     except (json.JSONDecodeError, ValueError):
         pass
@@ -60,9 +180,9 @@ def parse_resume_to_schema(text: str) -> ResumeSchema:
     try:
         # Extract personal info (basic pattern matching)
         personal_info = {}
-        name_match = re.search(r'(?:Name|Full Name):\s*(.+)', text, re.IGNORECASE)
-        email_match = re.search(r'Email:\s*([^\s]+)', text, re.IGNORECASE)
-        phone_match = re.search(r'Phone:\s*([^\n]+)', text, re.IGNORECASE)
+        name_match = _NAME_RE.search(text)
+        email_match = _EMAIL_RE.search(text)
+        phone_match = _PHONE_RE.search(text)
         
         if name_match:
             personal_info['name'] = name_match.group(1).strip()
@@ -72,32 +192,31 @@ def parse_resume_to_schema(text: str) -> ResumeSchema:
             personal_info['phone'] = phone_match.group(1).strip()
         
         # Extract summary
-        summary_match = re.search(r'(?:Summary|Professional Summary):\s*(.+?)(?=\n\n|\n[A-Z])', text, re.DOTALL | re.IGNORECASE)
+        summary_match = _SUMMARY_RE.search(text)
         summary = summary_match.group(1).strip() if summary_match else "Professional summary"
         
         # Extract work experience
         work_experience = []
-        work_section = re.search(r'(?:Work Experience|Experience|Employment):\s*(.+?)(?=\n(?:Skills|Education|$))', text, re.DOTALL | re.IGNORECASE)
+        work_section = _WORK_RE.search(text)
         if work_section:
             work_text = work_section.group(1)
             # Try to find job entries
-            job_pattern = r'(?:Title|Position):\s*(.+?)\n(?:Company|Employer):\s*(.+?)\n(?:Bullets|Responsibilities):\s*(.+?)(?=\n(?:Title|Position|$))'
-            jobs = re.finditer(job_pattern, work_text, re.DOTALL | re.IGNORECASE)
+            jobs = _JOB_RE.finditer(work_text)
             for job_match in jobs:
                 title = job_match.group(1).strip()
                 company = job_match.group(2).strip()
                 bullets_text = job_match.group(3).strip()
-                bullets = [b.strip() for b in bullets_text.split('\n') if b.strip() and b.strip().startswith(('-', '•', '*'))]
+                bullets = [b for b in map(str.strip, bullets_text.split('\n')) if b.startswith(('-', '•', '*'))]
                 if not bullets:
                     bullets = [bullets_text]  # Fallback to single bullet
                 work_experience.append(Job(title=title, company=company, rewritten_bullets=bullets))
         
         # Extract skills
-        skills_section = re.search(r'(?:Skills|Technical Skills):\s*(.+?)(?=\n\n|$)', text, re.DOTALL | re.IGNORECASE)
+        skills_section = _SKILLS_RE.search(text)
         skills = []
         if skills_section:
             skills_text = skills_section.group(1)
-            skills = [s.strip() for s in re.split(r'[,;•\-\n]', skills_text) if s.strip()]
+            skills = [s for s in map(str.strip, _SKILL_SPLIT_RE.split(skills_text)) if s]
         
         # Ensure we have minimum required data
         if not personal_info: